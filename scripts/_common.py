@@ -0,0 +1,243 @@
+"""Helpers shared by the development scripts in this directory."""
+
+import functools
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Dict, Iterable, Iterator, List, Optional, Tuple
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+CACHE_DIR = PROJECT_DIR / ".cache"
+
+SOURCE_EXTENSIONS = (".cc", ".cpp", ".cxx")
+HEADER_EXTENSIONS = (".h", ".hpp")
+EXCLUDE_DIRS = {"build", "vcpkg_installed", ".cache", ".git", "third_party"}
+
+_MARKUP_TAG = re.compile(r"\[/?[a-z][a-z. ]*\]|\[/\]")
+
+
+class PlainConsole:
+    """Stand-in for rich's Console that prints unstyled text."""
+    
+    is_terminal = False
+    
+    def print(self, *objects: Any, **kwargs: Any) -> None:
+        print(*(_MARKUP_TAG.sub("", str(obj)) for obj in objects), flush=True)
+
+
+class LazyConsole:
+    """Console proxy that defers importing rich until output is produced.
+
+    Importing rich is a large part of script startup, so it is skipped
+    entirely when stdout isn't a terminal.
+    """
+    
+    def __init__(self) -> None:
+        self._backend: Optional[Any] = None
+    
+    @property
+    def backend(self) -> Any:
+        if self._backend is None:
+            if sys.stdout.isatty():
+                from rich.console import Console
+                self._backend = Console()
+            else:
+                self._backend = PlainConsole()
+        return self._backend
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.backend, name)
+
+
+@contextmanager
+def progress_bar(console: LazyConsole, description: str, total: int) -> Iterator[Callable[[int], None]]:
+    """Show a progress bar on terminals and yield a callback advancing it."""
+    if not console.is_terminal:
+        yield lambda advance: None
+        return
+    
+    from rich.progress import BarColumn, MofNCompleteColumn, Progress, SpinnerColumn, TextColumn
+    
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        MofNCompleteColumn(),
+        console=console.backend,
+    ) as progress:
+        task_id = progress.add_task(description, total=total)
+        yield lambda advance: progress.update(task_id, advance=advance)
+
+
+@contextmanager
+def spinner(console: LazyConsole) -> Iterator[Callable[[str], ContextManager[None]]]:
+    """Share one spinner display across a sequence of steps.
+
+    Yields a function that wraps a step in a context manager. Off the
+    terminal each step prints a single line instead.
+    """
+    if not console.is_terminal:
+        @contextmanager
+        def plain_step(description: str) -> Iterator[None]:
+            console.print(description)
+            yield
+        
+        yield plain_step
+        return
+    
+    from rich.progress import Progress, SpinnerColumn, TextColumn
+    
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        console=console.backend,
+    ) as progress:
+        @contextmanager
+        def step(description: str) -> Iterator[None]:
+            task = progress.add_task(description, total=None)
+            yield
+            progress.update(task, completed=True, visible=False)
+        
+        yield step
+
+
+def _walk(directory: str, suffixes: Tuple[str, ...]) -> Iterator[Path]:
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in EXCLUDE_DIRS:
+                    yield from _walk(entry.path, suffixes)
+            elif entry.name.endswith(suffixes):
+                yield Path(entry.path)
+
+
+def find_cpp_files(extensions: Iterable[str]) -> List[Path]:
+    """Find all files with the given extensions in the project.
+
+    The tree is walked once with os.scandir, excluded directories are never
+    descended into, and Path objects are only built for matching files.
+    """
+    return sorted(_walk(str(PROJECT_DIR), tuple(extensions)))
+
+
+def select_cpp_files(paths: Iterable[Path], extensions: Iterable[str]) -> List[Path]:
+    """Filter an explicit list of paths down to the project files find_cpp_files would return."""
+    suffixes = tuple(extensions)
+    project_dir = PROJECT_DIR.resolve()
+    files = set()
+    for path in paths:
+        if not path.name.endswith(suffixes) or not path.is_file():
+            continue
+        try:
+            relative = path.resolve().relative_to(project_dir)
+        except ValueError:
+            continue
+        if EXCLUDE_DIRS.intersection(relative.parts[:-1]):
+            continue
+        files.add(PROJECT_DIR / relative)
+    
+    return sorted(files)
+
+
+def read_stdin_paths() -> List[Path]:
+    """Read file names from stdin, NUL-separated (git diff -z) or one per line."""
+    data = sys.stdin.read()
+    names = data.split("\0") if "\0" in data else data.splitlines()
+    return [Path(name) for name in names if name]
+
+
+def file_key(file: Path) -> str:
+    """Return a cheap fingerprint of a file's contents based on size and mtime."""
+    stat = file.stat()
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def config_key(configs: Iterable[Path]) -> str:
+    """Return a fingerprint of the contents of a tool's config files."""
+    # Hash contents rather than stat the files: CMake rewrites
+    # compile_commands.json on every configure even when nothing changed
+    digest = hashlib.blake2b(digest_size=16)
+    for config in configs:
+        try:
+            data = config.read_bytes()
+        except OSError:
+            continue
+        digest.update(f"{config}\0{len(data)}\0".encode())
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def read_cache(tool: str) -> Tuple[Optional[str], Dict[str, str]]:
+    """Read the config key and file keys recorded by the last run of a tool.
+
+    Files in the cache passed the tool's check at the recorded key, but only
+    under the recorded config key.
+    """
+    cache_file = CACHE_DIR / f"{tool}-cache.json"
+    try:
+        data = json.loads(cache_file.read_text())
+    except (OSError, ValueError):
+        return None, {}
+    
+    if not isinstance(data, dict):
+        return None, {}
+    
+    return data.get("config"), data.get("files", {})
+
+
+def load_cache(tool: str, configs: Iterable[Path]) -> Dict[str, str]:
+    """Load the file keys recorded by the last run of a tool.
+
+    The whole cache is discarded when any of the tool's config files changed
+    since.
+    """
+    config, files = read_cache(tool)
+    return files if config == config_key(configs) else {}
+
+
+def save_cache(tool: str, configs: Iterable[Path], files: Dict[str, str]) -> None:
+    """Atomically write the file keys that passed a tool's check.
+
+    The cache is only an optimization, so failing to write it is not an error.
+    """
+    data = json.dumps({"config": config_key(configs), "files": files})
+    try:
+        CACHE_DIR.mkdir(exist_ok=True)
+        # Concurrent runs (e.g. pre-commit's parallel chunks) each need their
+        # own temporary file; the last rename wins
+        fd, tmp_name = tempfile.mkstemp(prefix=f"{tool}-cache.", suffix=".tmp", dir=CACHE_DIR)
+        try:
+            with os.fdopen(fd, "w") as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_name, CACHE_DIR / f"{tool}-cache.json")
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+    except OSError:
+        pass
+
+
+@functools.lru_cache(maxsize=None)
+def _which(program: str) -> str:
+    return shutil.which(program) or program
+
+
+def run_tool(cmd: List[str], **kwargs: Any) -> subprocess.CompletedProcess:
+    """Run a tool, letting subprocess spawn it with os.posix_spawn.
+
+    CPython only takes the posix_spawn path for an absolute executable with
+    close_fds=False, which is safe because Python creates file descriptors
+    non-inheritable (PEP 446).
+    """
+    return subprocess.run(
+        [_which(cmd[0]), *cmd[1:]],
+        close_fds=sys.platform == "win32",
+        **kwargs,
+    )
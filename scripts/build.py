@@ -15,6 +15,8 @@ Examples:
     uv run scripts/build.py --mode debug
     uv run scripts/build.py --mode release --tests
     uv run scripts/build.py --mode debug --tests --clean --export-compile-commands
+    uv run scripts/build.py --generator "Unix Makefiles"
+    uv run scripts/build.py --fast --tests
 
 This script handles:
 - CMake configuration with git submodule dependencies
@@ -23,42 +25,103 @@ This script handles:
 - Clean builds
 - Cross-platform support
 - Export compile commands for IDEs
+- Compiler caching via sccache/ccache when installed
+- Opt-in unity builds and precompiled headers, applied to the SDK's own
+  targets only and never combined with exported compile commands
+- A --fast preset for the edit-compile-test loop: Ninja, compiler cache and
+  precompiled headers (no unity build, it makes every edit recompile a
+  whole batch of sources)
 """
 
 import os
 import shutil
 import subprocess
 import sys
+from collections import deque
 from pathlib import Path
 from typing import Optional
 
 import click
-from rich.console import Console
-from rich.panel import Panel
-from rich.progress import Progress, SpinnerColumn, TextColumn
-from rich.table import Table
 
-console = Console()
+from _common import LazyConsole, spinner
+
+console = LazyConsole()
+
+
+def print_output(text: str) -> None:
+    """Print raw command output, unwrapped when not on a terminal."""
+    if console.is_terminal:
+        from rich.markup import escape
+        console.print(f"[dim]{escape(text)}[/dim]")
+    else:
+        print(text, flush=True)
 
 
 def run_command(cmd: list[str], cwd: Optional[Path] = None, check: bool = True) -> subprocess.CompletedProcess:
-    """Run a command and handle errors with rich output."""
+    """Run a command, streaming its output live with rich formatting."""
     console.print(f"[dim]Running:[/dim] [cyan]{' '.join(cmd)}[/cyan]")
     
-    try:
-        result = subprocess.run(cmd, cwd=cwd, check=check, capture_output=True, text=True)
-        if result.stdout.strip():
-            console.print(f"[dim]{result.stdout.strip()}[/dim]")
-        return result
-    except subprocess.CalledProcessError as e:
-        console.print(f"[red]Error running command:[/red] {e}")
-        if e.stderr:
-            console.print(f"[red]Error output:[/red] {e.stderr}")
-        if e.stdout:
-            console.print(f"[yellow]Output:[/yellow] {e.stdout}")
+    # Keep only the tail of the output around for error reporting
+    tail: deque[str] = deque(maxlen=200)
+    
+    with subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        bufsize=1,
+    ) as proc:
+        assert proc.stdout is not None
+        for line in proc.stdout:
+            line = line.rstrip()
+            tail.append(line)
+            print_output(line)
+        returncode = proc.wait()
+    
+    if check and returncode != 0:
+        console.print(f"[red]Error running command:[/red] {' '.join(cmd)} exited with status {returncode}")
+        if tail:
+            console.print(f"[red]Last {len(tail)} lines of output:[/red]")
+            print_output("\n".join(tail))
         sys.exit(1)
+    
+    return subprocess.CompletedProcess(cmd, returncode)
 
 
+def resolve_parallel_jobs(jobs: Optional[int]) -> int:
+    """Pick the number of parallel build jobs.
+
+    An explicit --jobs wins, then CMAKE_BUILD_PARALLEL_LEVEL. Otherwise the
+    available cores are oversubscribed by 1.25x so they stay busy while
+    compilers block on header reads.
+    """
+    if jobs:
+        return jobs
+    
+    env_jobs = os.environ.get("CMAKE_BUILD_PARALLEL_LEVEL")
+    if env_jobs and env_jobs.isdigit() and int(env_jobs) > 0:
+        return int(env_jobs)
+    
+    try:
+        # Respects CPU affinity / cgroup limits on Linux CI runners
+        cpu_count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpu_count = os.cpu_count() or 4
+    
+    return max(1, int(cpu_count * 1.25) + 1)
+
+
+def configured_generator(build_dir: Path) -> Optional[str]:
+    """Return the generator recorded in an existing build directory's CMake cache."""
+    cmake_cache = build_dir / "CMakeCache.txt"
+    if not cmake_cache.exists():
+        return None
+    
+    for line in cmake_cache.read_text(errors="replace").splitlines():
+        if line.startswith("CMAKE_GENERATOR:"):
+            return line.split("=", 1)[1].strip() or None
+    return None
 
 
 @click.command()
@@ -92,9 +155,35 @@ def run_command(cmd: list[str], cwd: Optional[Path] = None, check: bool = True)
     "--jobs",
     type=int,
     default=None,
-    help="Number of parallel build jobs (default: CPU count)"
+    help="Number of parallel build jobs (default: CMAKE_BUILD_PARALLEL_LEVEL or 1.25x CPU count)"
+)
+@click.option(
+    "--generator",
+    "-G",
+    default=None,
+    help="CMake generator to use (default: Ninja if available)"
 )
-def main(mode: str, tests: bool, clean: bool, verbose: bool, export_compile_commands: bool, jobs: Optional[int]):
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    help="Use sccache or ccache as compiler launcher if available"
+)
+@click.option(
+    "--unity/--no-unity",
+    default=False,
+    help="Compile SDK components as unity builds"
+)
+@click.option(
+    "--pch/--no-pch",
+    default=None,
+    help="Precompile common headers for SDK components"
+)
+@click.option(
+    "--fast",
+    is_flag=True,
+    help="Preset for the incremental dev loop: Ninja, compiler cache and PCH (no unity build, to keep rebuilds incremental)"
+)
+def main(mode: str, tests: bool, clean: bool, verbose: bool, export_compile_commands: bool, jobs: Optional[int], generator: Optional[str], cache: bool, unity: bool, pch: Optional[bool], fast: bool):
     """Build AI SDK C++ with modern tooling."""
     
     # Get project paths
@@ -102,91 +191,147 @@ def main(mode: str, tests: bool, clean: bool, verbose: bool, export_compile_comm
     project_root = script_dir.parent
     build_dir = project_root / "build"
     
+    # The fast preset only changes defaults, explicitly passed options still win
+    if fast:
+        if clean:
+            raise click.UsageError("--fast relies on incremental build state, which --clean discards")
+        if pch is None:
+            pch = True
+        if generator is None and not shutil.which("ninja"):
+            console.print("[yellow]⚠ Warning: ninja not found, --fast falls back to CMake's default generator[/yellow]")
+        if cache and not (shutil.which("sccache") or shutil.which("ccache")):
+            console.print("[yellow]⚠ Warning: neither sccache nor ccache found, --fast builds without a compiler cache[/yellow]")
+    
+    # CMake refuses to switch generators in a configured build directory, so
+    # only pick one ourselves for a fresh directory
+    configured = None if clean else configured_generator(build_dir)
+    pass_generator = generator is not None or configured is None
+    if generator is None:
+        if configured is not None:
+            generator = configured
+        elif shutil.which("ninja"):
+            # Prefer Ninja, otherwise let CMake pick its default
+            generator = "Ninja"
+    
+    # Compiler cache lets rebuilds skip unchanged translation units
+    launcher = (shutil.which("sccache") or shutil.which("ccache")) if cache else None
+    
+    parallel_jobs = resolve_parallel_jobs(jobs)
+    
+    if pch is None:
+        pch = False
+    
+    # Unity builds list Unity/unity_N_cxx.cxx instead of the real sources in
+    # compile_commands.json, and clang-based tools reject GCC's PCH files
+    if export_compile_commands and (unity or pch):
+        console.print("[yellow]⚠ Warning: unity builds and precompiled headers break exported compile commands, disabling them[/yellow]")
+        unity = pch = False
+    
+    # ccache only caches compiles using a precompiled header with these relaxed checks
+    if launcher and pch and Path(launcher).stem == "ccache":
+        sloppiness = {"pch_defines", "time_macros"}
+        sloppiness.update(filter(None, os.environ.get("CCACHE_SLOPPINESS", "").split(",")))
+        os.environ["CCACHE_SLOPPINESS"] = ",".join(sorted(sloppiness))
+    
     # Display build configuration
-    config_table = Table(title="Build Configuration", show_header=True, header_style="bold blue")
-    config_table.add_column("Setting", style="cyan")
-    config_table.add_column("Value", style="green")
-    
-    config_table.add_row("Project root", str(project_root))
-    config_table.add_row("Build directory", str(build_dir))
-    config_table.add_row("Build mode", mode.upper())
-    config_table.add_row("With tests", "✓" if tests else "✗")
-    config_table.add_row("Clean build", "✓" if clean else "✗")
-    config_table.add_row("Export compile commands", "✓" if export_compile_commands else "✗")
-    config_table.add_row("Parallel jobs", str(jobs or os.cpu_count() or 4))
-    
-    console.print(config_table)
-    console.print()
+    config_rows = [
+        ("Fast preset", "✓" if fast else "✗"),
+        ("Project root", str(project_root)),
+        ("Build directory", str(build_dir)),
+        ("Build mode", mode.upper()),
+        ("Generator", generator or "CMake default"),
+        ("Compiler cache", Path(launcher).name if launcher else "✗"),
+        ("Unity build", "✓" if unity else "✗"),
+        ("Precompiled headers", "✓" if pch else "✗"),
+        ("With tests", "✓" if tests else "✗"),
+        ("Clean build", "✓" if clean else "✗"),
+        ("Export compile commands", "✓" if export_compile_commands else "✗"),
+        ("Parallel jobs", str(parallel_jobs)),
+    ]
     
-    # Clean build directory if requested
-    if clean and build_dir.exists():
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            console=console,
-        ) as progress:
-            task = progress.add_task("Cleaning build directory...", total=None)
-            shutil.rmtree(build_dir)
-            progress.update(task, completed=True)
-        console.print("[green]✓[/green] Build directory cleaned")
-    
-    # Create build directory
-    build_dir.mkdir(exist_ok=True)
-    
-    console.print("[green]✓[/green] Dependencies configured via git submodules")
+    if console.is_terminal:
+        from rich.table import Table
+        
+        config_table = Table(title="Build Configuration", show_header=True, header_style="bold blue")
+        config_table.add_column("Setting", style="cyan")
+        config_table.add_column("Value", style="green")
+        for setting, value in config_rows:
+            config_table.add_row(setting, value)
+        console.print(config_table)
+    else:
+        for setting, value in config_rows:
+            console.print(f"{setting}: {value}")
     console.print()
     
-    # Configure CMake
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        console=console,
-    ) as progress:
-        task = progress.add_task("Configuring with CMake...", total=None)
-        
-        cmake_args = [
-            'cmake',
-            str(project_root),
-            '-G', 'Ninja',
-            f'-DCMAKE_BUILD_TYPE={mode.title()}',
-        ]
-        
-        # Add export compile commands option
-        if export_compile_commands:
-            cmake_args.append('-DCMAKE_EXPORT_COMPILE_COMMANDS=ON')
+    # One live display is shared by all build steps
+    with spinner(console) as build_step:
+        # Clean build directory if requested
+        if clean and build_dir.exists():
+            with build_step("Cleaning build directory..."):
+                shutil.rmtree(build_dir)
+            console.print("[green]✓[/green] Build directory cleaned")
         
-        # Add test option
-        cmake_args.append(f'-DBUILD_TESTS={"ON" if tests else "OFF"}')
+        # Create build directory
+        build_dir.mkdir(exist_ok=True)
         
-        # Always build examples for now
-        cmake_args.append('-DBUILD_EXAMPLES=ON')
+        console.print("[green]✓[/green] Dependencies configured via git submodules")
+        if launcher:
+            console.print(f"[green]✓[/green] Using compiler cache: [cyan]{launcher}[/cyan]")
+        console.print()
         
-        run_command(cmake_args, cwd=build_dir)
-        progress.update(task, completed=True)
-    
-    console.print("[green]✓[/green] CMake configuration completed")
-    
-    # Build
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        console=console,  
-    ) as progress:
-        task = progress.add_task("Building...", total=None)
+        # Configure CMake
+        with build_step("Configuring with CMake..."):
+            cmake_args = [
+                'cmake',
+                str(project_root),
+            ]
+            
+            if generator and pass_generator:
+                cmake_args.extend(['-G', generator])
+            
+            cmake_args.append(f'-DCMAKE_BUILD_TYPE={mode.title()}')
+            
+            # Add export compile commands option (free with Ninja, and lint.py
+            # needs it, but unity/PCH builds produce a database it can't use).
+            # Never turn it off, it may have been enabled by hand
+            if export_compile_commands or (generator == "Ninja" and not (unity or pch)):
+                cmake_args.append('-DCMAKE_EXPORT_COMPILE_COMMANDS=ON')
+            
+            if launcher:
+                cmake_args.append(f'-DCMAKE_C_COMPILER_LAUNCHER={launcher}')
+                cmake_args.append(f'-DCMAKE_CXX_COMPILER_LAUNCHER={launcher}')
+            
+            cmake_args.append(f'-DENABLE_UNITY_BUILD={"ON" if unity else "OFF"}')
+            cmake_args.append(f'-DENABLE_PRECOMPILED_HEADERS={"ON" if pch else "OFF"}')
+            
+            # Add test option
+            cmake_args.append(f'-DBUILD_TESTS={"ON" if tests else "OFF"}')
+            
+            # Always build examples for now
+            cmake_args.append('-DBUILD_EXAMPLES=ON')
+            
+            run_command(cmake_args, cwd=build_dir)
         
-        build_args = ['cmake', '--build', '.']
+        console.print("[green]✓[/green] CMake configuration completed")
         
-        if verbose:
-            build_args.append('--verbose')
+        # Build
+        with build_step("Building..."):
+            build_args = ['cmake', '--build', '.']
+            
+            if verbose:
+                build_args.append('--verbose')
+            
+            # Add parallel build option
+            build_args.extend(['--parallel', str(parallel_jobs)])
+            
+            run_command(build_args, cwd=build_dir)
         
-        # Add parallel build option
-        parallel_jobs = jobs or os.cpu_count() or 4
-        build_args.extend(['--parallel', str(parallel_jobs)])
-        
-        run_command(build_args, cwd=build_dir)
-        progress.update(task, completed=True)
+        console.print("[green]✓[/green] Build completed successfully!")
     
-    console.print("[green]✓[/green] Build completed successfully!")
+    # The database is either left over from an earlier configure or lists
+    # unity/PCH compiles, and lint.py would pick it up either way
+    if (unity or pch) and (build_dir / "compile_commands.json").exists():
+        console.print("[yellow]⚠ Warning: build/compile_commands.json does not match this unity/PCH build, rebuild with --export-compile-commands before running clang tools[/yellow]")
     
     # Copy compile commands if requested
     if export_compile_commands:
@@ -202,8 +347,7 @@ def main(mode: str, tests: bool, clean: bool, verbose: bool, export_compile_comm
     console.print()
     
     # Display build results
-    results_panel = Panel.fit(
-        f"""[bold green]Build Results[/bold green]
+    results = f"""[bold green]Build Results[/bold green]
 
 [bold]Built targets:[/bold]
   📚 Library: {build_dir}/libai-sdk-cpp.a (or .lib on Windows)
@@ -219,12 +363,14 @@ def main(mode: str, tests: bool, clean: bool, verbose: bool, export_compile_comm
 {"""[bold]To run tests:[/bold]
   [cyan]cd build && ctest[/cyan]
   [cyan]cd build && ctest --verbose[/cyan]
-  [cyan]cd build && ctest -R "test_types"[/cyan] (run specific test)""" if tests else ""}""",
-        title="🎉 Success",
-        border_style="green"
-    )
+  [cyan]cd build && ctest -R "test_types"[/cyan] (run specific test)""" if tests else ""}"""
     
-    console.print(results_panel)
+    if console.is_terminal:
+        from rich.panel import Panel
+        
+        console.print(Panel.fit(results, title="🎉 Success", border_style="green"))
+    else:
+        console.print(results)
 
 
 if __name__ == '__main__':
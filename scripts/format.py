@@ -8,42 +8,53 @@
 # ///
 """Format all C++ source files using clang-format.
 
-Usage: uv run scripts/format.py [--check]
+Usage: uv run scripts/format.py [--check] [FILES...]
+
+Examples:
+    uv run scripts/format.py
+    uv run scripts/format.py --check src/types/message.cpp
+    git diff -z --name-only --diff-filter=d | uv run scripts/format.py --check --from-stdin
+
+Without FILES or --from-stdin every C++ file in the project is processed.
 """
 
+import os
 import shutil
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import List, Tuple
 
 import click
-from rich.console import Console
-from rich.progress import track
 
-console = Console()
+from _common import (
+    HEADER_EXTENSIONS,
+    PROJECT_DIR,
+    SOURCE_EXTENSIONS,
+    LazyConsole,
+    file_key,
+    find_cpp_files,
+    load_cache,
+    progress_bar,
+    read_stdin_paths,
+    run_tool,
+    save_cache,
+    select_cpp_files,
+)
 
+console = LazyConsole()
 
-def find_cpp_files() -> List[Path]:
-    """Find all C++ source and header files in the project."""
-    project_dir = Path(__file__).parent.parent
-    extensions = {".h", ".hpp", ".cc", ".cpp", ".cxx"}
-    exclude_dirs = {"build", "vcpkg_installed", ".cache", ".git", "third_party"}
-    
-    files = []
-    for ext in extensions:
-        for file in project_dir.rglob(f"*{ext}"):
-            # Skip files in excluded directories
-            if any(excluded in file.parts for excluded in exclude_dirs):
-                continue
-            files.append(file)
-    
-    return sorted(files)
+# Number of files passed to a single clang-format invocation
+FORMAT_BATCH_SIZE = 32
+
+# Changes to these invalidate cached results
+CACHE_CONFIGS = [PROJECT_DIR / ".clang-format"]
 
 
 def check_file_format(file: Path) -> bool:
     """Check if a file is properly formatted."""
-    result = subprocess.run(
+    result = run_tool(
         ["clang-format", "--dry-run", "--Werror", str(file)],
         stdout=subprocess.PIPE,
         stderr=subprocess.DEVNULL
@@ -51,17 +62,20 @@ def check_file_format(file: Path) -> bool:
     return result.returncode == 0
 
 
-def format_file(file: Path) -> None:
-    """Format a file in place."""
-    subprocess.run(
-        ["clang-format", "-i", str(file)],
+def format_files(files: List[Path]) -> None:
+    """Format a batch of files in place with a single clang-format process."""
+    run_tool(
+        ["clang-format", "-i", *map(str, files)],
         check=True
     )
 
 
 @click.command()
 @click.option("--check", is_flag=True, help="Check formatting without modifying files")
-def main(check: bool):
+@click.option("--cache/--no-cache", default=True, help="Skip files unchanged since they were last found formatted")
+@click.option("--from-stdin", is_flag=True, help="Read file names from stdin (NUL- or newline-separated)")
+@click.argument("paths", nargs=-1, type=click.Path(exists=True, dir_okay=False, path_type=Path))
+def main(check: bool, cache: bool, from_stdin: bool, paths: Tuple[Path, ...]):
     """Format all C++ source files using clang-format."""
     # Check if clang-format is installed
     if not shutil.which("clang-format"):
@@ -69,22 +83,52 @@ def main(check: bool):
         console.print("Install it with: brew install clang-format (macOS) or apt-get install clang-format (Ubuntu)")
         sys.exit(1)
     
-    # Find all C++ files
-    files = find_cpp_files()
+    # Use the given files, or find all C++ files
+    if paths or from_stdin:
+        stdin_paths = read_stdin_paths() if from_stdin else []
+        files = select_cpp_files([*paths, *stdin_paths], SOURCE_EXTENSIONS + HEADER_EXTENSIONS)
+    else:
+        files = find_cpp_files(SOURCE_EXTENSIONS + HEADER_EXTENSIONS)
     
     if not files:
         console.print("[yellow]No C++ files found[/yellow]")
         return
     
+    # Skip files that are unchanged since they were last known to be formatted
+    cached = load_cache("format", CACHE_CONFIGS) if cache else {}
+    keys = {str(file): file_key(file) for file in files}
+    up_to_date = {name: key for name, key in keys.items() if cached.get(name) == key}
+    if up_to_date:
+        files = [file for file in files if str(file) not in up_to_date]
+        console.print(f"[dim]Skipping {len(up_to_date)} files unchanged since the last run[/dim]")
+    
+    if not files:
+        console.print("[green]✅ Nothing to do, all files unchanged since the last run[/green]")
+        return
+    
     if check:
         console.print(f"[blue]Checking code formatting for {len(files)} files...[/blue]\n")
         
         needs_format = []
-        for file in track(files, description="Checking files...", console=console):
-            if not check_file_format(file):
+        # clang-format runs out of process, so threads give full parallelism
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor, \
+                progress_bar(console, "Checking files...", len(files)) as advance:
+            for formatted, file in zip(executor.map(check_file_format, files), files):
+                advance(1)
+                if formatted:
+                    continue
                 needs_format.append(file)
                 console.print(f"[red]✗[/red] {file.relative_to(file.parent.parent)}")
         
+        # Only the checked files' entries change, so runs on a subset of files keep the rest
+        if cache:
+            for file in files:
+                if file in needs_format:
+                    cached.pop(str(file), None)
+                else:
+                    cached[str(file)] = keys[str(file)]
+            save_cache("format", CACHE_CONFIGS, cached)
+        
         if not needs_format:
             console.print("\n[green]✅ All files are properly formatted[/green]")
             sys.exit(0)
@@ -97,9 +141,19 @@ def main(check: bool):
     else:
         console.print(f"[blue]Formatting {len(files)} C++ files...[/blue]\n")
         
-        for file in track(files, description="Formatting files...", console=console):
-            format_file(file)
-            console.print(f"[green]✓[/green] {file.name}")
+        with progress_bar(console, "Formatting files...", len(files)) as advance:
+            # Batch files to amortize clang-format startup and config loading
+            for start in range(0, len(files), FORMAT_BATCH_SIZE):
+                batch = files[start:start + FORMAT_BATCH_SIZE]
+                format_files(batch)
+                for file in batch:
+                    console.print(f"[green]✓[/green] {file.name}")
+                advance(len(batch))
+        
+        # Formatting may have rewritten files, so record their new keys
+        if cache:
+            cached.update({str(file): file_key(file) for file in files})
+            save_cache("format", CACHE_CONFIGS, cached)
         
         console.print("\n[green]✅ All files have been formatted[/green]")
 
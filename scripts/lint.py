@@ -4,27 +4,53 @@
 # dependencies = [
 #     "click>=8.1.0",
 #     "rich>=13.0.0",
-#     "asyncio",
 # ]
 # ///
 """Run clang-tidy on all C++ source files in parallel.
 
-Usage: uv run scripts/lint.py [--fix] [--jobs N]
+Usage: uv run scripts/lint.py [--fix] [--jobs N] [--verbose] [FILES...]
+
+Examples:
+    uv run scripts/lint.py
+    uv run scripts/lint.py src/types/message.cpp
+    git diff -z --name-only --diff-filter=d | uv run scripts/lint.py --from-stdin
+
+Without FILES or --from-stdin every C++ source file in the project is linted.
 """
 
-import asyncio
+import functools
+import json
 import os
+import re
 import shutil
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import click
-from rich.console import Console
-from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, MofNCompleteColumn
 
-console = Console()
+from _common import (
+    HEADER_EXTENSIONS,
+    PROJECT_DIR,
+    SOURCE_EXTENSIONS,
+    LazyConsole,
+    config_key,
+    file_key,
+    find_cpp_files,
+    progress_bar,
+    read_cache,
+    read_stdin_paths,
+    run_tool,
+    save_cache,
+    select_cpp_files,
+)
+
+console = LazyConsole()
+
+# Report diagnostics in the project's public headers, whichever driver runs
+HEADER_FILTER = f"^{re.escape(str(PROJECT_DIR / 'include') + os.sep)}"
 
 
 def find_compile_commands() -> Optional[Path]:
@@ -45,6 +71,22 @@ def find_compile_commands() -> Optional[Path]:
     return None
 
 
+def load_compile_db_files(compile_commands: Path) -> Dict[Path, str]:
+    """Map the resolved path of each file in compile_commands.json to its spelling there.
+
+    The spelling is the path run-clang-tidy matches its file arguments
+    against, which keeps symlinks unresolved.
+    """
+    entries = json.loads(compile_commands.read_text())
+    files = {}
+    for entry in entries:
+        name = entry["file"]
+        if not os.path.isabs(name):
+            name = os.path.normpath(os.path.join(entry.get("directory", ""), name))
+        files[Path(name).resolve()] = name
+    return files
+
+
 def get_system_include_args() -> List[str]:
     """Get system include paths for macOS."""
     if sys.platform != "darwin":
@@ -72,93 +114,62 @@ def get_system_include_args() -> List[str]:
     return []
 
 
-def find_cpp_files() -> List[Path]:
-    """Find all C++ source files in the project."""
-    project_dir = Path(__file__).parent.parent
-    extensions = {".cc", ".cpp", ".cxx"}
-    exclude_dirs = {"build", "vcpkg_installed", ".cache", ".git", "third_party"}
-    
-    files = []
-    for ext in extensions:
-        for file in project_dir.rglob(f"*{ext}"):
-            # Skip files in excluded directories
-            if any(excluded in file.parts for excluded in exclude_dirs):
-                continue
-            files.append(file)
-    
-    return sorted(files)
-
-
-async def lint_file(
-    file: Path, 
+def lint_file(
+    file: Path,
     compile_commands: Path,
     fix: bool,
     extra_args: List[str],
-    semaphore: asyncio.Semaphore
 ) -> Tuple[Path, bool, str]:
     """Run clang-tidy on a single file."""
-    async with semaphore:
-        cmd = [
-            "clang-tidy",
-            f"-p={compile_commands}",
-            *extra_args,
-        ]
-        
-        if fix:
-            cmd.extend(["--fix", "--fix-errors"])
-        
-        cmd.append(str(file))
-        
-        proc = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        
-        stdout, stderr = await proc.communicate()
-        
-        output = stdout.decode() + stderr.decode()
-        success = proc.returncode == 0
-        
-        return file, success, output
+    cmd = [
+        "clang-tidy",
+        f"-p={compile_commands}",
+        f"-header-filter={HEADER_FILTER}",
+        *extra_args,
+    ]
+    
+    if fix:
+        cmd.extend(["--fix", "--fix-errors"])
+    
+    cmd.append(str(file))
+    
+    result = run_tool(cmd, capture_output=True, text=True)
+    
+    output = result.stdout + result.stderr
+    success = result.returncode == 0
+    
+    return file, success, output
 
 
-async def lint_all_files(files: List[Path], compile_commands: Path, fix: bool, jobs: int):
-    """Lint all files in parallel."""
-    extra_args = get_system_include_args()
-    semaphore = asyncio.Semaphore(jobs)
-    
-    # Create tasks for all files
-    tasks = [
-        lint_file(file, compile_commands, fix, extra_args, semaphore)
-        for file in files
-    ]
+def lint_all_files(files: List[Path], compile_commands: Path, fix: bool, jobs: int, verbose: bool) -> List[Path]:
+    """Lint all files in parallel and return the ones with issues."""
+    lint_one = functools.partial(
+        lint_file,
+        compile_commands=compile_commands,
+        fix=fix,
+        extra_args=get_system_include_args(),
+    )
     
     # Run with progress bar
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        BarColumn(),
-        MofNCompleteColumn(),
-        console=console,
-    ) as progress:
-        task_id = progress.add_task(
-            "[cyan]Linting files...", 
-            total=len(files)
-        )
-        
+    with progress_bar(console, "[cyan]Linting files...", len(files)) as advance:
         failed_files = []
         
-        # Process results as they complete
-        for coro in asyncio.as_completed(tasks):
-            file, success, output = await coro
-            progress.update(task_id, advance=1)
-            
-            if success:
-                console.print(f"[green]✓[/green] {file.name}")
-            else:
-                console.print(f"[red]✗[/red] {file.name}")
-                failed_files.append((file, output))
+        # Each worker just waits on its clang-tidy child, so threads suffice
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            # Process results as they complete
+            futures = [executor.submit(lint_one, file) for file in files]
+            for future in as_completed(futures):
+                file, success, output = future.result()
+                advance(1)
+                
+                # Every print redraws the live progress bar, so passing files
+                # are only listed on request
+                if success:
+                    if verbose:
+                        console.print(f"[green]✓[/green] {file.name}")
+                else:
+                    console.print(f"[red]✗[/red] {file.name}")
+                    failed_files.append((file, output))
         
         # Print details for failed files
         if failed_files:
@@ -167,13 +178,59 @@ async def lint_all_files(files: List[Path], compile_commands: Path, fix: bool, j
                 console.print(f"\n[yellow]{file}:[/yellow]")
                 console.print(output)
         
-        return len(failed_files) == 0
+        return [file for file, _ in failed_files]
+
+
+def run_clang_tidy_all(
+    run_clang_tidy: str,
+    files: List[str],
+    compile_commands: Path,
+    fix: bool,
+    jobs: int,
+) -> Tuple[bool, List[str]]:
+    """Lint all files with LLVM's run-clang-tidy driver in a single call.
+
+    Files must be spelled as in compile_commands.json. Returns whether the
+    run passed and which of the files run-clang-tidy actually linted.
+    """
+    cmd = [
+        run_clang_tidy,
+        "-p", str(compile_commands.parent),
+        "-j", str(jobs),
+        f"-header-filter={HEADER_FILTER}",
+    ]
+    
+    # run-clang-tidy spells its options with a single dash
+    cmd.extend(arg[1:] for arg in get_system_include_args())
+    
+    if fix:
+        cmd.append("-fix")
+    
+    # File arguments are regular expressions matched against the path
+    cmd.extend(f"^{re.escape(file)}$" for file in files)
+    
+    # run-clang-tidy echoes each clang-tidy invocation, which ends with the
+    # file name; stream the output and note which files it reached
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    seen = set()
+    for line in process.stdout:
+        sys.stdout.write(line)
+        words = line.split()
+        if words:
+            seen.add(words[-1])
+    process.wait()
+    
+    return process.returncode == 0, [file for file in files if file in seen]
 
 
 @click.command()
 @click.option("--fix", is_flag=True, help="Apply fixes automatically")
 @click.option("--jobs", "-j", type=int, default=os.cpu_count() or 4, help="Number of parallel jobs")
-def main(fix: bool, jobs: int):
+@click.option("--cache/--no-cache", default=True, help="Skip files unchanged since they last linted cleanly")
+@click.option("--verbose", "-v", is_flag=True, help="List every linted file, not just failures (lints without run-clang-tidy)")
+@click.option("--from-stdin", is_flag=True, help="Read file names from stdin (NUL- or newline-separated)")
+@click.argument("paths", nargs=-1, type=click.Path(exists=True, dir_okay=False, path_type=Path))
+def main(fix: bool, jobs: int, cache: bool, verbose: bool, from_stdin: bool, paths: Tuple[Path, ...]):
     """Run clang-tidy on all C++ source files in parallel."""
     # Check if clang-tidy is installed
     if not shutil.which("clang-tidy"):
@@ -193,16 +250,89 @@ def main(fix: bool, jobs: int):
     console.print(f"[blue]Using compile commands: {compile_commands}[/blue]")
     console.print(f"[blue]Running with {jobs} parallel jobs[/blue]")
     
-    # Find all C++ files
-    files = find_cpp_files()
+    # Use the given files, or find all C++ files. Headers are part of the
+    # cache's config key, and are only looked up for explicit files when needed.
+    headers: Optional[List[Path]] = None
+    if paths or from_stdin:
+        stdin_paths = read_stdin_paths() if from_stdin else []
+        files = select_cpp_files([*paths, *stdin_paths], SOURCE_EXTENSIONS)
+    else:
+        all_files = find_cpp_files(SOURCE_EXTENSIONS + HEADER_EXTENSIONS)
+        files = [file for file in all_files if file.name.endswith(SOURCE_EXTENSIONS)]
+        headers = [file for file in all_files if file.name.endswith(HEADER_EXTENSIONS)]
+    
+    # clang-tidy can't check files it has no compile command for
+    compile_db_files = load_compile_db_files(compile_commands)
+    not_in_db = [file for file in files if file.resolve() not in compile_db_files]
+    if not_in_db:
+        files = [file for file in files if file.resolve() in compile_db_files]
+        console.print(f"[dim]Skipping {len(not_in_db)} files not in compile_commands.json[/dim]")
+    
     console.print(f"[blue]Found {len(files)} files to lint[/blue]\n")
     
     if not files:
         console.print("[yellow]No C++ files found to lint[/yellow]")
         return
     
-    # Run linting
-    success = asyncio.run(lint_all_files(files, compile_commands, fix, jobs))
+    # Skip files that are unchanged since they last linted cleanly
+    keys = {str(file): file_key(file) for file in files}
+    cached: Dict[str, str] = {}
+    if cache:
+        stored_config, stored = read_cache("lint")
+        # Walking the tree for headers only pays off if some file could be skipped
+        if headers is None and any(stored.get(name) == key for name, key in keys.items()):
+            headers = find_cpp_files(HEADER_EXTENSIONS)
+        
+        # Results depend on the included headers too, so any header change
+        # invalidates the whole cache
+        if headers is not None:
+            cache_configs = [PROJECT_DIR / ".clang-tidy", compile_commands, *headers]
+            if stored_config == config_key(cache_configs):
+                cached = stored
+    
+    up_to_date = {name: key for name, key in keys.items() if cached.get(name) == key}
+    if up_to_date:
+        files = [file for file in files if str(file) not in up_to_date]
+        console.print(f"[dim]Skipping {len(up_to_date)} files unchanged since the last clean lint[/dim]")
+    
+    if not files:
+        # run-clang-tidy would lint the whole compile database without file filters
+        console.print("[green]✅ Nothing to lint, all files unchanged since the last clean lint[/green]")
+        return
+    
+    # Run linting, preferring LLVM's batch driver over per-file spawning
+    run_clang_tidy = shutil.which("run-clang-tidy")
+    if fix and not shutil.which("clang-apply-replacements"):
+        # run-clang-tidy -fix needs clang-apply-replacements, which distro
+        # clang-tidy packages don't always ship
+        run_clang_tidy = None
+    if verbose:
+        # run-clang-tidy doesn't report per-file results
+        run_clang_tidy = None
+    if run_clang_tidy:
+        console.print(f"[blue]Using {run_clang_tidy}[/blue]")
+        db_names = {compile_db_files[file.resolve()]: file for file in files}
+        success, linted = run_clang_tidy_all(run_clang_tidy, list(db_names), compile_commands, fix, jobs)
+        # Failures can't be attributed to files, and files run-clang-tidy never
+        # reached were not checked, so neither may be cached as clean
+        unlinted = [file for name, file in db_names.items() if name not in linted]
+        if unlinted:
+            console.print(f"[yellow]⚠️  run-clang-tidy did not lint {len(unlinted)} of {len(files)} files[/yellow]")
+        failed = unlinted if success else files
+        success = not failed
+    else:
+        failed = lint_all_files(files, compile_commands, fix, jobs, verbose)
+        success = not failed
+    
+    # Only the linted files' entries change, so runs on a subset of files keep
+    # the rest. Without the headers there is no config key to save under.
+    if cache and headers is not None:
+        for file in files:
+            if file in failed:
+                cached.pop(str(file), None)
+            else:
+                cached[str(file)] = keys[str(file)]
+        save_cache("lint", cache_configs, cached)
     
     # Print summary
     console.print()